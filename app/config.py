@@ -1,4 +1,5 @@
 import os
+import signal
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,6 +10,33 @@ class Settings:
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "supersecretkey")  # Đổi thành key bảo mật
     ACCESS_TOKEN_EXPIRE_MINUTES = 30  # 30 phút
     REFRESH_TOKEN_EXPIRE_DAYS = 7  # 7 ngày
+    # Server (see app/server.py)
+    HOST = os.getenv("HOST", "0.0.0.0")
+    PORT = int(os.getenv("PORT", "8000"))
+    # 0 = một worker mỗi CPU
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0"))
+    KEEPALIVE_TIMEOUT = int(os.getenv("KEEPALIVE_TIMEOUT", "5"))  # giây
+    BACKLOG = int(os.getenv("BACKLOG", "2048"))
+    GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))  # giây
+    PRELOAD_APP = os.getenv("PRELOAD_APP", "true").lower() in ("1", "true", "yes")
+    # Requests with "X-Profile: <token>" are profiled; empty disables it
+    PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+    # Shared by all workers; use a shared volume when running several hosts
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/fastapi_auth_profiles")
+    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    # Cache invalidation across workers: "local" (one host) or "redis"
+    INVALIDATION_BACKEND = os.getenv("INVALIDATION_BACKEND", "local")
+    INVALIDATION_LOG_PATH = os.getenv(
+        "INVALIDATION_LOG_PATH", "/tmp/fastapi_auth_invalidation.log"
+    )
+    INVALIDATION_MAX_DELAY = float(os.getenv("INVALIDATION_MAX_DELAY", "1.0"))  # giây
 
 
 settings = Settings()
+
+# Cluster-wide profiling, shared by app/server.py and app/profiling.py
+# Lets workers recognise that their parent is the serve supervisor
+SUPERVISOR_PID_ENV = "SERVE_SUPERVISOR_PID"
+# Sent by /debug/profile to the supervisor, which forwards it to every worker;
+# None where the platform has no SIGUSR2 (Windows)
+PROFILE_SIGNAL = getattr(signal, "SIGUSR2", None)
@@ -1,11 +1,11 @@
-from sqlalchemy.orm import Session
-from app.database import SessionLocal, engine
-from app.models import Base, Role
+from app import migrate
+from app.database import SessionLocal
+from app.models import Role
 
 
 def init_db():
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    # Bring the schema up to date
+    migrate.upgrade()
 
     # Create a new session
     db = SessionLocal()
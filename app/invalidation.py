@@ -0,0 +1,444 @@
+import fcntl
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from app.config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+USER = "user"
+ROLE = "role"
+TOKEN = "token"
+# Pseudo-kind delivered when a subscriber may have missed events; drop everything.
+RESET = "*"
+
+
+@dataclass(frozen=True)
+class InvalidationEvent:
+    """A single invalidation broadcast to every worker."""
+
+    kind: str
+    key: str
+    version: int
+    origin: str
+
+    def encode(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def decode(cls, raw: Any) -> "InvalidationEvent":
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        return cls(**json.loads(raw))
+
+
+def normalize_key(kind: str, key: Any) -> str:
+    """
+    Turn a cache key into the form sent on the bus.
+
+    Keys travel as strings, so ``5`` and ``"5"`` are the same key. Usernames
+    are case-insensitive (see the lower(username) index), so USER keys are
+    lowercased as well.
+
+    Args:
+        kind: USER, ROLE or TOKEN
+        key: Identifier of the cached object
+
+    Returns:
+        str: The normalized key
+    """
+    key = str(key)
+    return key.lower() if kind == USER else key
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class InvalidationBus:
+    """
+    Publish/subscribe channel for cache invalidation across workers.
+
+    Subclasses deliver every published event, including the publisher's own,
+    to every subscriber, normally within ``max_delay`` seconds. If an event
+    may have been lost (connection dropped, log rotated), subscribers deliver
+    a RESET event instead so caches start over rather than serve stale
+    entries; how soon that happens depends on the backend.
+    """
+
+    def __init__(self, max_delay: float = 1.0):
+        self.max_delay = max_delay
+        self.origin = _worker_id()
+        self._callbacks: List[Callable[[InvalidationEvent], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, callback: Callable[[InvalidationEvent], None]) -> None:
+        """Register ``callback`` to be called (from the bus thread) for every event."""
+        self._callbacks.append(callback)
+
+    def publish(self, kind: str, key: Any) -> InvalidationEvent:
+        """
+        Broadcast that ``key`` of ``kind`` changed.
+
+        Args:
+            kind: USER, ROLE or TOKEN
+            key: Identifier of the changed object, e.g. a username
+
+        Returns:
+            InvalidationEvent: The published event
+        """
+        if kind not in (USER, ROLE, TOKEN):
+            raise ValueError(f"Unknown invalidation kind: {kind}")
+        event = self._publish(kind, normalize_key(kind, key))
+        logger.info(f"Published invalidation {event.kind}:{event.key} v{event.version}")
+        return event
+
+    def start(self) -> "InvalidationBus":
+        """Subscribe and start the listener thread; safe to call more than once."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            # Subscribe before returning so every later publish is seen.
+            self._subscribe()
+            self._thread = threading.Thread(
+                target=self._listen, name=type(self).__name__, daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.max_delay * 2)
+            self._thread = None
+
+    def _deliver(self, event: InvalidationEvent) -> None:
+        for callback in list(self._callbacks):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(
+                    f"Error handling invalidation {event.kind}:{event.key}: {str(e)}"
+                )
+
+    def _reset(self, reason: str) -> None:
+        logger.warning(f"Invalidation bus reset: {reason}")
+        self._deliver(
+            InvalidationEvent(kind=RESET, key="", version=0, origin=self.origin)
+        )
+
+    def _publish(self, kind: str, key: str) -> InvalidationEvent:
+        raise NotImplementedError
+
+    def _subscribe(self) -> None:
+        raise NotImplementedError
+
+    def _listen(self) -> None:
+        raise NotImplementedError
+
+
+class RedisInvalidationBus(InvalidationBus):
+    """
+    Invalidation bus over Redis pub/sub, for workers spread across hosts.
+
+    Every event takes the next value of a shared counter as its version.
+    Pub/sub is at-most-once, so each subscriber checks every ``max_delay``
+    seconds that it received all versions published before its previous
+    check, and resets its caches if any are missing. A lost message is thus
+    only noticed two checks after it was published, i.e. within
+    ``2 * (max_delay + min(max_delay / 2, 0.5))`` seconds, the last term
+    being the poll timeout: 3 seconds with the default ``max_delay`` of 1.
+    """
+
+    def __init__(
+            self,
+            url: Optional[str] = None,
+            channel: str = "auth:invalidation",
+            max_delay: float = 1.0,
+            client: Any = None,
+    ):
+        super().__init__(max_delay)
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("RedisInvalidationBus requires the 'redis' package")
+            client = redis.Redis.from_url(url or settings.REDIS_URL)
+        self._client = client
+        self.channel = channel
+        self._counter_key = f"{channel}:version"
+        self._pubsub = None
+        self._watermark = 0
+        self._settled: Optional[int] = None
+        self._received: Set[int] = set()
+
+    def _publish(self, kind: str, key: str) -> InvalidationEvent:
+        version = int(self._client.incr(self._counter_key))
+        event = InvalidationEvent(
+            kind=kind, key=key, version=version, origin=self.origin
+        )
+        self._client.publish(self.channel, event.encode())
+        return event
+
+    def _current_version(self) -> int:
+        return int(self._client.get(self._counter_key) or 0)
+
+    def _check_gaps(self) -> None:
+        """Reset if any version published before the previous check never arrived."""
+        current = self._current_version()
+        settled, self._settled = self._settled, current
+        if current < self._watermark:
+            self._watermark, self._received = current, set()
+            self._reset("version counter went backwards")
+            return
+        if settled is None or settled <= self._watermark:
+            return
+
+        arrived = {version for version in self._received if version <= settled}
+        self._received -= arrived
+        missing = settled - self._watermark - len(arrived)
+        self._watermark = settled
+        if missing > 0:
+            self._reset(f"missed {missing} event(s)")
+
+    def _subscribe(self) -> None:
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self.channel)
+        # Anything published before we subscribed is unaccounted for.
+        self._watermark = self._settled = self._current_version()
+        self._received = set()
+
+    def _listen(self) -> None:
+        next_check = time.monotonic() + self.max_delay
+        while not self._stop.is_set():
+            try:
+                if self._pubsub is None:
+                    self._subscribe()
+                    self._reset("resubscribed")
+
+                message = self._pubsub.get_message(timeout=min(self.max_delay / 2, 0.5))
+                if message and message.get("type") == "message":
+                    event = InvalidationEvent.decode(message["data"])
+                    if event.version > self._watermark:
+                        self._received.add(event.version)
+                    self._deliver(event)
+
+                if time.monotonic() >= next_check:
+                    self._check_gaps()
+                    next_check = time.monotonic() + self.max_delay
+            except Exception as e:
+                logger.error(f"Redis invalidation listener error: {str(e)}")
+                self._close_pubsub()
+                self._stop.wait(self.max_delay)
+
+        self._close_pubsub()
+
+    def _close_pubsub(self) -> None:
+        if self._pubsub is not None:
+            try:
+                self._pubsub.close()
+            except Exception:
+                pass
+            self._pubsub = None
+
+
+class LocalInvalidationBus(InvalidationBus):
+    """
+    Invalidation bus for workers on a single host, over an append-only log file.
+
+    Publishers append one JSON line per event under an exclusive lock; the
+    event's version is its byte offset in the log. Subscribers tail the file
+    every ``max_delay`` seconds. When the log exceeds ``max_bytes`` it is
+    replaced by an empty one and subscribers reset their caches.
+    """
+
+    def __init__(
+            self,
+            path: Optional[str] = None,
+            max_delay: float = 0.2,
+            max_bytes: int = 1 << 20,
+    ):
+        super().__init__(max_delay)
+        self.path = path or settings.INVALIDATION_LOG_PATH
+        self.max_bytes = max_bytes
+        self._lock_path = f"{self.path}.lock"
+        self._log = None
+        # Make sure the log exists before the first subscriber opens it.
+        with self._locked():
+            open(self.path, "a").close()
+
+    @contextmanager
+    def _locked(self):
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _publish(self, kind: str, key: str) -> InvalidationEvent:
+        with self._locked():
+            with open(self.path, "a") as log:
+                version = log.seek(0, os.SEEK_END)
+                event = InvalidationEvent(
+                    kind=kind, key=key, version=version, origin=self.origin
+                )
+                log.write(event.encode() + "\n")
+            if version >= self.max_bytes:
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                open(tmp_path, "w").close()
+                os.replace(tmp_path, self.path)
+        return event
+
+    def _subscribe(self) -> None:
+        self._log = open(self.path, "r")
+        self._log.seek(0, os.SEEK_END)
+
+    def _listen(self) -> None:
+        pending = ""
+        try:
+            while not self._stop.is_set():
+                try:
+                    pending += self._log.read()
+                    *lines, pending = pending.split("\n")
+                    for line in lines:
+                        if line:
+                            self._deliver(InvalidationEvent.decode(line))
+
+                    if os.stat(self.path).st_ino != os.fstat(self._log.fileno()).st_ino:
+                        self._log.close()
+                        self._log = open(self.path, "r")
+                        pending = ""
+                        self._reset("log rotated")
+                        continue
+                except Exception as e:
+                    logger.error(f"Local invalidation listener error: {str(e)}")
+                self._stop.wait(self.max_delay)
+        finally:
+            self._log.close()
+
+
+class InvalidatingCache:
+    """
+    Per-worker LRU cache whose entries are dropped by bus events of one kind.
+
+    Use ``get_or_load`` rather than ``get``/``set`` so a value loaded while an
+    invalidation for it was in flight is not stored. Keys go through
+    ``normalize_key`` so they match what ``InvalidationBus.publish`` sends.
+    """
+
+    def __init__(
+            self,
+            bus: InvalidationBus,
+            kind: str,
+            maxsize: int = 10000,
+            ttl: float = 300.0,
+    ):
+        self.kind = kind
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        bus.subscribe(self._on_event)
+
+    def get(self, key: Any) -> Optional[Any]:
+        key = normalize_key(self.kind, key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def get_or_load(self, key: Any, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for ``key``, calling ``loader`` on a miss.
+
+        Args:
+            key: Cache key, matching the key published on the bus
+            loader: Produces the value; ``None`` results are not cached
+
+        Returns:
+            Any: The cached or freshly loaded value
+        """
+        key = normalize_key(self.kind, key)
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        generation = self._generation
+        value = loader()
+        if value is not None:
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = (value, time.monotonic() + self.ttl)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key: Any) -> None:
+        key = normalize_key(self.kind, key)
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _on_event(self, event: InvalidationEvent) -> None:
+        if event.kind == RESET:
+            self.clear()
+        elif event.kind == self.kind:
+            self.invalidate(event.key)
+
+
+_bus: Optional[InvalidationBus] = None
+_bus_pid: Optional[int] = None
+_bus_lock = threading.Lock()
+
+
+def get_invalidation_bus() -> InvalidationBus:
+    """
+    Return this worker's invalidation bus, configured from Settings.
+
+    The bus is created lazily and recreated after a fork, since its listener
+    thread does not survive into the child.
+
+    Returns:
+        InvalidationBus: The started bus
+    """
+    global _bus, _bus_pid
+    with _bus_lock:
+        if _bus is None or _bus_pid != os.getpid():
+            max_delay = settings.INVALIDATION_MAX_DELAY
+            backends: Dict[str, Callable[[], InvalidationBus]] = {
+                "redis": lambda: RedisInvalidationBus(max_delay=max_delay),
+                "local": lambda: LocalInvalidationBus(max_delay=max_delay),
+            }
+            if settings.INVALIDATION_BACKEND not in backends:
+                raise ValueError(
+                    f"Unknown invalidation backend: {settings.INVALIDATION_BACKEND}"
+                )
+            _bus = backends[settings.INVALIDATION_BACKEND]().start()
+            _bus_pid = os.getpid()
+        return _bus
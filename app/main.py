@@ -1,12 +1,19 @@
 from fastapi import FastAPI
 from fastapi import Depends
 
+from app.config import settings
 from app.models import User
+from app.profiling import ProfilingMiddleware, router as debug_router
 from app.routes import router as auth_router
 from app.rbac.dependencies import get_current_user, require_role
 
 app = FastAPI()
 app.include_router(auth_router)
+app.include_router(debug_router)
+
+# Only installed when a token is configured, so requests pay nothing otherwise
+if settings.PROFILING_TOKEN:
+    app.add_middleware(ProfilingMiddleware, token=settings.PROFILING_TOKEN)
 
 
 @app.get("/")
@@ -35,6 +42,6 @@ def read_user_data(current_user: User = Depends(get_current_user)):
 
 
 if __name__ == "__main__":
-    import uvicorn
+    from app.server import main
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    main()
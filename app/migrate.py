@@ -0,0 +1,43 @@
+from pathlib import Path
+from typing import Optional
+
+from alembic import command
+from alembic.config import Config
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+def get_alembic_config(url: Optional[str] = None) -> Config:
+    """
+    Build the Alembic config used by init_db and the tests.
+
+    Args:
+        url: Database URL; defaults to Settings.DATABASE_URL (see migrations/env.py)
+
+    Returns:
+        Config: Alembic configuration
+    """
+    config = Config(str(ALEMBIC_INI))
+    # Don't let alembic.ini's logging section reset the app's logging setup.
+    config.attributes["configure_logger"] = False
+    if url:
+        config.set_main_option("sqlalchemy.url", url)
+    return config
+
+
+def upgrade(
+        revision: str = "head",
+        url: Optional[str] = None,
+        sql: bool = False,
+) -> None:
+    """Upgrade the schema to ``revision``; with ``sql=True`` only print the SQL."""
+    command.upgrade(get_alembic_config(url), revision, sql=sql)
+
+
+def downgrade(
+        revision: str = "base",
+        url: Optional[str] = None,
+        sql: bool = False,
+) -> None:
+    """Downgrade the schema to ``revision``; with ``sql=True`` only print the SQL."""
+    command.downgrade(get_alembic_config(url), revision, sql=sql)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Index, func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -6,20 +6,34 @@ from app.database import Base
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True, index=True)
-    email = Column(String, unique=True, index=True)
+    id = Column(Integer, primary_key=True)
+    username = Column(String)
+    email = Column(String)
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
-    role_id = Column(Integer, ForeignKey("roles.id"))
+    role_id = Column(Integer, ForeignKey("roles.id"), index=True)
 
     role = relationship("Role", back_populates="users")
 
+    # Kept in sync with migrations/versions/0002_auth_lookup_indexes.py.
+    # Lookups must filter on func.lower(...) for these indexes to be used.
+    __table_args__ = (
+        Index(
+            "ix_users_username_lower",
+            func.lower(username),
+            unique=True,
+            postgresql_include=[
+                "id", "username", "email", "hashed_password", "is_active", "role_id"
+            ],
+        ),
+        Index("ix_users_email_lower", func.lower(email), unique=True),
+    )
+
 
 class Role(Base):
     __tablename__ = "roles"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, unique=True, index=True)
 
     users = relationship("User", back_populates="role")
@@ -0,0 +1,379 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import re
+import shutil
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType
+from typing import Iterator, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.config import PROFILE_SIGNAL, SUPERVISOR_PID_ENV, settings
+from app.models import User
+from app.rbac.dependencies import require_role
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/debug", tags=["Debug"])
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "x-profile-id"
+MAX_PROFILE_SECONDS = 60
+MAX_STACK_DEPTH = 128
+# Per-request profiles kept for retrieval, oldest dropped first
+MAX_STORED_PROFILES = 20
+# Extra time workers get to write their part of a cluster-wide profile
+SESSION_GRACE_SECONDS = 2
+PROFILE_ID = re.compile(r"[0-9a-f]{32}")
+
+# Only one sampler runs per process at a time; it sees every thread anyway.
+_active = threading.Lock()
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the stacks of all threads.
+
+    A background thread wakes every ``interval`` seconds and records the
+    current stack of every other thread, so the profiled code runs without
+    any instrumentation. Nothing runs while the profiler is stopped.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    name = names.get(thread_id, str(thread_id))
+                    self.samples[(name, self._stack(frame))] += 1
+
+    @staticmethod
+    def _stack(frame: Optional[FrameType]) -> Tuple[str, ...]:
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+    def collapsed(self, prefix: Optional[str] = None) -> str:
+        """
+        Render samples in collapsed-stack format (``thread;outer;...;inner count``).
+
+        The output feeds straight into flamegraph.pl or speedscope.
+
+        Args:
+            prefix: Optional root frame, e.g. the worker, added to every stack
+
+        Returns:
+            str: One line per distinct stack, most frequent first
+        """
+        root = (prefix,) if prefix else ()
+        lines = [
+            f"{';'.join(root + (thread,) + stack)} {count}"
+            for (thread, stack), count in self.samples.most_common()
+        ]
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+def _requests_dir() -> Path:
+    return Path(settings.PROFILE_DIR) / "requests"
+
+
+def _sessions_dir() -> Path:
+    return Path(settings.PROFILE_DIR) / "sessions"
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(text)
+    os.replace(tmp_path, path)
+
+
+def get_stored_profile(profile_id: str) -> Optional[str]:
+    """
+    Read a per-request profile written by any worker.
+
+    Args:
+        profile_id: Value of the ``X-Profile-Id`` response header
+
+    Returns:
+        Optional[str]: Collapsed stacks, or None if unknown or evicted
+    """
+    if not PROFILE_ID.fullmatch(profile_id):
+        return None
+    try:
+        return (_requests_dir() / f"{profile_id}.txt").read_text()
+    except FileNotFoundError:
+        return None
+
+
+def _store_profile(profile_id: str, profile: str) -> None:
+    _write_atomic(_requests_dir() / f"{profile_id}.txt", profile)
+    stored = sorted(
+        _requests_dir().glob("*.txt"), key=lambda path: path.stat().st_mtime
+    )
+    for path in stored[:-MAX_STORED_PROFILES]:
+        path.unlink(missing_ok=True)
+
+
+def _supervised() -> bool:
+    """True when running as a worker of ``serve``'s pre-forking supervisor."""
+    if PROFILE_SIGNAL is None:
+        return False
+    return os.environ.get(SUPERVISOR_PID_ENV) == str(os.getppid())
+
+
+@contextmanager
+def _cluster_lock() -> Iterator[bool]:
+    """
+    Try to become the only ``/debug/profile`` running across all workers.
+
+    Without ``fcntl`` (Windows) there are no forked workers, so the
+    process-local lock taken by the caller is enough.
+
+    Yields:
+        bool: Whether the lock was acquired
+    """
+    if fcntl is None:
+        yield True
+        return
+    _sessions_dir().mkdir(parents=True, exist_ok=True)
+    with open(_sessions_dir() / ".lock", "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+
+
+def _start_session(session_id: str, seconds: float, interval: float) -> None:
+    _write_atomic(
+        _sessions_dir() / "current.json",
+        json.dumps({"id": session_id, "seconds": seconds, "interval": interval}),
+    )
+
+
+def _sample_for_session() -> None:
+    """Profile this worker for the current session and write its share."""
+    try:
+        session = json.loads((_sessions_dir() / "current.json").read_text())
+    except (OSError, ValueError) as e:
+        logger.error(f"Cannot read profiling session: {str(e)}")
+        return
+    if not _active.acquire(blocking=False):
+        logger.warning(f"Profiler busy, worker {os.getpid()} skips session")
+        return
+    try:
+        profiler = SamplingProfiler(session["interval"]).start()
+        time.sleep(session["seconds"])
+        profiler.stop()
+    finally:
+        _active.release()
+    result = profiler.collapsed(prefix=f"worker-{os.getpid()}")
+    _write_atomic(_sessions_dir() / session["id"] / f"{os.getpid()}.txt", result)
+
+
+def _collect_session(session_id: str) -> str:
+    session_dir = _sessions_dir() / session_id
+    parts = [path.read_text() for path in sorted(session_dir.glob("*.txt"))]
+    shutil.rmtree(session_dir, ignore_errors=True)
+    return "".join(parts)
+
+
+def install_profile_signal_handler() -> None:
+    """
+    Let the supervisor start a cluster-wide profile in this worker.
+
+    Called by ``serve`` in every worker. The handler only starts a sampling
+    thread; nothing runs until ``/debug/profile`` sends the signal. Does
+    nothing on platforms without the signal.
+    """
+    if PROFILE_SIGNAL is None:
+        return
+    signal.signal(
+        PROFILE_SIGNAL,
+        lambda signum, frame: threading.Thread(
+            target=_sample_for_session, name="profile-session", daemon=True
+        ).start(),
+    )
+
+
+class ProfilingMiddleware:
+    """
+    Profile single requests that carry ``X-Profile: <token>``.
+
+    The response gets an ``X-Profile-Id`` header; the profile is written to
+    ``PROFILE_DIR``, so ``GET /debug/profile/requests/{id}`` finds it from
+    any worker. Requests without the header pass straight through. Sampling
+    covers every thread while the request runs, so profile on a quiet
+    instance for clean results.
+    """
+
+    def __init__(self, app, token: str, interval: float = 0.001):
+        self.app = app
+        self.token = token.encode()
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not _active.acquire(blocking=False):
+            logger.warning("Profiler busy, serving request unprofiled")
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER.encode(), profile_id.encode())
+                ]
+            await send(message)
+
+        profiler = SamplingProfiler(self.interval).start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            _active.release()
+            try:
+                _store_profile(profile_id, profiler.collapsed())
+                logger.info(f"Stored profile {profile_id} for {scope.get('path')}")
+            except OSError as e:
+                logger.error(f"Error storing profile {profile_id}: {str(e)}")
+
+    def _requested(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER.encode():
+                return hmac.compare_digest(value, self.token)
+        return False
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+        seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_SECONDS),
+        interval_ms: float = Query(5.0, ge=1, le=100),
+        user: User = Depends(require_role(["Admin"])),
+) -> str:
+    """
+    Sample all threads of every worker for ``seconds``.
+
+    Under ``serve`` the supervisor forwards a signal to all workers; each one
+    samples itself and writes its stacks to ``PROFILE_DIR``, rooted at a
+    ``worker-<pid>`` frame. Otherwise only this process is sampled.
+
+    Args:
+        seconds: How long to sample
+        interval_ms: Time between samples in milliseconds
+        user: Current admin user
+
+    Returns:
+        str: Collapsed stacks, ready for flamegraph.pl
+
+    Raises:
+        HTTPException: If another profile is already running
+    """
+    with _cluster_lock() as acquired:
+        if not acquired:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A profile is already running"
+            )
+
+        logger.info(f"Profiling for {seconds}s requested by: {user.username}")
+        if _supervised():
+            session_id = uuid.uuid4().hex
+            _start_session(session_id, seconds, interval_ms / 1000)
+            os.kill(os.getppid(), PROFILE_SIGNAL)
+            await asyncio.sleep(seconds + SESSION_GRACE_SECONDS)
+            return _collect_session(session_id)
+
+        if not _active.acquire(blocking=False):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A profile is already running"
+            )
+        try:
+            profiler = SamplingProfiler(interval_ms / 1000).start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.stop()
+            return profiler.collapsed(prefix=f"worker-{os.getpid()}")
+        finally:
+            _active.release()
+
+
+@router.get("/profile/requests/{profile_id}", response_class=PlainTextResponse)
+def request_profile(
+        profile_id: str,
+        user: User = Depends(require_role(["Admin"])),
+) -> str:
+    """
+    Return the profile of a request made with the ``X-Profile`` header.
+
+    Args:
+        profile_id: Value of the ``X-Profile-Id`` response header
+        user: Current admin user
+
+    Returns:
+        str: Collapsed stacks, ready for flamegraph.pl
+
+    Raises:
+        HTTPException: If the profile is unknown or was evicted
+    """
+    result = get_stored_profile(profile_id)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return result
@@ -4,6 +4,7 @@ from fastapi import Depends, HTTPException, status
 from app.models import User
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.config import settings
@@ -24,7 +25,9 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user: Optional[User] = db.query(User).filter(User.username == username).first()
+    user: Optional[User] = db.query(User).filter(
+        func.lower(User.username) == func.lower(username)
+    ).first()
     if user is None:
         raise credentials_exception
     return user
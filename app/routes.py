@@ -2,6 +2,7 @@ import logging
 from typing import Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import User, Role
@@ -32,13 +33,15 @@ def register(user: UserCreate, db: Session = Depends(get_db)) -> dict[str, Any]:
         Dict[str, Any]: Created user data
         
     Raises:
-        HTTPException: If username exists or role is invalid
+        HTTPException: If username or email exists or role is invalid
     """
     try:
         logger.info(f"Attempting to register user: {user.username}")
 
         # Check if username exists
-        db_user = db.query(User).filter(User.username == user.username).first()
+        db_user = db.query(User).filter(
+            func.lower(User.username) == func.lower(user.username)
+        ).first()
         if db_user:
             logger.warning(f"Username already exists: {user.username}")
             raise HTTPException(
@@ -46,6 +49,17 @@ def register(user: UserCreate, db: Session = Depends(get_db)) -> dict[str, Any]:
                 detail="Username already exists"
             )
 
+        # Check if email exists
+        db_user = db.query(User).filter(
+            func.lower(User.email) == func.lower(user.email)
+        ).first()
+        if db_user:
+            logger.warning(f"Email already registered: {user.email}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered"
+            )
+
         # Get role
         role: Optional[Role] = db.query(Role).filter(Role.name == user.role).first()
         if not role:
@@ -106,7 +120,9 @@ def login(
     try:
         logger.info(f"Login attempt for user: {form_data.username}")
 
-        user = db.query(User).filter(User.username == form_data.username).first()
+        user = db.query(User).filter(
+            func.lower(User.username) == func.lower(form_data.username)
+        ).first()
         if not user or not verify_password(form_data.password, user.hashed_password):
             logger.warning(f"Invalid credentials for user: {form_data.username}")
             raise HTTPException(
@@ -0,0 +1,308 @@
+import argparse
+import importlib.util
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import uvicorn
+
+from app.config import PROFILE_SIGNAL, SUPERVISOR_PID_ENV, settings
+
+# Log through uvicorn's logger so supervisor messages share its handlers
+logger = logging.getLogger("uvicorn.error")
+
+APP = "app.main:app"
+# Exit status of a worker whose server never finished starting up
+WORKER_BOOT_ERROR = 3
+# More restarts than this within RESTART_WINDOW seconds is a crash loop
+MAX_RESTARTS = 5
+RESTART_WINDOW = 60
+
+
+def available_cpus() -> int:
+    """
+    Count the CPUs this process may actually use.
+
+    Honours the scheduler affinity mask and a cgroup v2 CPU quota, so a
+    container limited to 2 CPUs on a 64-core node gets 2 workers, not 64.
+
+    Returns:
+        int: Number of usable CPUs, at least 1
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+
+    return max(1, cpus)
+
+
+def _has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+def build_config(
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        workers: Optional[int] = None,
+) -> uvicorn.Config:
+    """
+    Build the uvicorn config from Settings, with optional overrides.
+
+    uvloop and httptools are used when installed, asyncio and h11 otherwise.
+
+    Args:
+        host: Interface to bind, defaults to Settings.HOST
+        port: Port to bind, defaults to Settings.PORT
+        workers: Worker processes, defaults to Settings.WEB_CONCURRENCY or one per CPU
+
+    Returns:
+        uvicorn.Config: Server configuration
+    """
+    return uvicorn.Config(
+        APP,
+        host=host or settings.HOST,
+        port=port or settings.PORT,
+        workers=workers or settings.WEB_CONCURRENCY or available_cpus(),
+        loop="uvloop" if _has_module("uvloop") else "asyncio",
+        http="httptools" if _has_module("httptools") else "h11",
+        backlog=settings.BACKLOG,
+        timeout_keep_alive=settings.KEEPALIVE_TIMEOUT,
+        timeout_graceful_shutdown=settings.GRACEFUL_TIMEOUT,
+        proxy_headers=True,
+    )
+
+
+class Supervisor:
+    """
+    Pre-forking process manager for uvicorn workers.
+
+    The listening socket is bound once in the parent and inherited by every
+    worker. With ``preload`` the application is imported before forking, so
+    workers share its memory copy-on-write and start instantly. Workers that
+    exit unexpectedly are replaced; SIGTERM/SIGINT stop them gracefully and
+    any still running after ``GRACEFUL_TIMEOUT`` are killed. A worker that
+    fails to boot, or more than ``MAX_RESTARTS`` restarts within
+    ``RESTART_WINDOW`` seconds, stops the whole server instead.
+    """
+
+    def __init__(self, config: uvicorn.Config, preload: bool = True):
+        self.config = config
+        self.preload = preload
+        self.workers: Dict[int, int] = {}
+        self.sock: Optional[socket.socket] = None
+        self._stopping = False
+        self._failed = False
+        self._restarts: Deque[float] = deque()
+
+    def run(self) -> int:
+        """
+        Start the workers and supervise them until stopped.
+
+        Returns:
+            int: Exit status for the process, non-zero if workers kept failing
+        """
+        self.sock = self.config.bind_socket()
+        if self.preload:
+            self.config.load()
+        logger.info(
+            f"Starting {self.config.workers} workers (loop={self.config.loop}, "
+            f"http={self.config.http}, preload={self.preload})"
+        )
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(PROFILE_SIGNAL, self._forward_profile_signal)
+        os.environ[SUPERVISOR_PID_ENV] = str(os.getpid())
+
+        for index in range(self.config.workers):
+            self._spawn(index)
+
+        while not self._stopping:
+            self._reap(respawn=True)
+            time.sleep(0.5)
+
+        self._shutdown()
+        return 1 if self._failed else 0
+
+    def _handle_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _forward_profile_signal(self, signum, frame) -> None:
+        for pid in list(self.workers):
+            _signal(pid, PROFILE_SIGNAL)
+
+    def _spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = index
+            return
+
+        # Worker: let uvicorn install its own graceful shutdown handlers.
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(PROFILE_SIGNAL, signal.SIG_IGN)
+        server = None
+        exit_code = 1
+        try:
+            _reset_after_fork()
+            from app.profiling import install_profile_signal_handler
+
+            install_profile_signal_handler()
+            server = uvicorn.Server(self.config)
+            server.run(sockets=[self.sock])
+            exit_code = 0
+        except BaseException:
+            logger.exception(f"Worker {os.getpid()} crashed")
+        finally:
+            # uvicorn returns normally when startup fails; report it as such.
+            if server is None or not server.started:
+                exit_code = WORKER_BOOT_ERROR
+            os._exit(exit_code)
+
+    def _reap(self, respawn: bool) -> None:
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if pid == 0:
+                return
+            index = self.workers.pop(pid, None)
+            if index is None or not respawn or self._stopping:
+                continue
+
+            exit_code, reason = _describe_exit(status)
+            if exit_code == WORKER_BOOT_ERROR:
+                self._fail(f"Worker {pid} failed to boot")
+            elif self._crash_looping():
+                self._fail(f"Workers restarted more than {MAX_RESTARTS} times "
+                           f"in {RESTART_WINDOW}s")
+            else:
+                logger.warning(f"Worker {pid} {reason}, restarting")
+                self._spawn(index)
+
+    def _crash_looping(self) -> bool:
+        now = time.monotonic()
+        self._restarts.append(now)
+        while self._restarts and self._restarts[0] < now - RESTART_WINDOW:
+            self._restarts.popleft()
+        return len(self._restarts) > MAX_RESTARTS
+
+    def _fail(self, reason: str) -> None:
+        logger.error(f"{reason}, shutting down")
+        self._failed = True
+        self._stopping = True
+
+    def _shutdown(self) -> None:
+        logger.info("Shutting down workers")
+        for pid in list(self.workers):
+            _signal(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + settings.GRACEFUL_TIMEOUT + 5
+        while self.workers and time.monotonic() < deadline:
+            self._reap(respawn=False)
+            time.sleep(0.1)
+
+        for pid in list(self.workers):
+            logger.warning(f"Worker {pid} did not stop in time, killing it")
+            _signal(pid, signal.SIGKILL)
+        self._reap(respawn=False)
+        self.sock.close()
+
+
+def _describe_exit(status: int) -> Tuple[Optional[int], str]:
+    if os.WIFEXITED(status):
+        exit_code = os.WEXITSTATUS(status)
+        return exit_code, f"exited with status {exit_code}"
+    return None, f"was killed by signal {os.WTERMSIG(status)}"
+
+
+def _signal(pid: int, signum: int) -> None:
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
+
+
+def _reset_after_fork() -> None:
+    """Drop state a preloaded parent must not share with its workers."""
+    database = sys.modules.get("app.database")
+    if database is not None:
+        # Pooled connections must not be shared between processes.
+        database.engine.dispose(close=False)
+
+
+def serve(
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        workers: Optional[int] = None,
+        preload: Optional[bool] = None,
+) -> None:
+    """
+    Run the production server.
+
+    Args:
+        host: Interface to bind, defaults to Settings.HOST
+        port: Port to bind, defaults to Settings.PORT
+        workers: Worker processes, defaults to Settings.WEB_CONCURRENCY or one per CPU
+        preload: Import the app before forking, defaults to Settings.PRELOAD_APP
+    """
+    config = build_config(host, port, workers)
+    if config.workers == 1:
+        server = uvicorn.Server(config)
+        server.run()
+        if not server.started:
+            sys.exit(WORKER_BOOT_ERROR)
+        return
+    preload = settings.PRELOAD_APP if preload is None else preload
+    sys.exit(Supervisor(config, preload).run())
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point of the ``serve`` console script."""
+    parser = argparse.ArgumentParser(
+        prog="serve", description="Run the FastAPI Auth server."
+    )
+    parser.add_argument(
+        "--host", help=f"interface to bind (default: {settings.HOST})"
+    )
+    parser.add_argument(
+        "--port", type=int, help=f"port to bind (default: {settings.PORT})"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="worker processes (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--preload",
+        dest="preload",
+        action="store_true",
+        default=None,
+        help="import the app before forking workers",
+    )
+    parser.add_argument(
+        "--no-preload",
+        dest="preload",
+        action="store_false",
+        help="import the app in each worker",
+    )
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.preload)
+
+
+if __name__ == "__main__":
+    main()
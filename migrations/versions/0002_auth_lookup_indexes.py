@@ -0,0 +1,87 @@
+"""Index users for case-insensitive auth lookups
+
+* ``ix_users_username_lower`` - unique on ``lower(username)``. On PostgreSQL it
+  INCLUDEs every column ``get_current_user`` loads, raw ``username`` included,
+  so the lookup can be an index-only scan.
+* ``ix_users_email_lower`` - unique on ``lower(email)``.
+* ``ix_users_role_id`` - serves the ``User.role`` / ``Role.users`` join.
+* Drops ``ix_users_id`` / ``ix_roles_id`` (the primary keys are already indexed)
+  and the case-sensitive ``ix_users_username`` / ``ix_users_email``, which the
+  new unique indexes make redundant.
+
+On PostgreSQL the indexes are built with ``CREATE INDEX CONCURRENTLY`` so the
+users table stays writable during the upgrade. The upgrade fails if existing
+rows differ only by case in username or email; resolve those first.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-03-26 00:00:00
+"""
+from contextlib import nullcontext
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# Everything db.query(User) selects. username must be stored raw: PostgreSQL
+# cannot read it back from the lower(username) key, and only plans index-only
+# scans on expression indexes when the underlying column is in the index.
+COVERING_COLUMNS = [
+    "id", "username", "email", "hashed_password", "is_active", "role_id"
+]
+
+
+def _is_postgresql() -> bool:
+    return op.get_context().dialect.name == "postgresql"
+
+
+def _index_block(concurrently: bool):
+    # CONCURRENTLY cannot run inside a transaction block.
+    return op.get_context().autocommit_block() if concurrently else nullcontext()
+
+
+def upgrade() -> None:
+    concurrently = _is_postgresql()
+    kw = {"postgresql_concurrently": concurrently}
+
+    with _index_block(concurrently):
+        op.create_index(
+            "ix_users_username_lower",
+            "users",
+            [sa.text("lower(username)")],
+            unique=True,
+            postgresql_include=COVERING_COLUMNS,
+            **kw,
+        )
+        op.create_index(
+            "ix_users_email_lower",
+            "users",
+            [sa.text("lower(email)")],
+            unique=True,
+            **kw,
+        )
+        op.create_index("ix_users_role_id", "users", ["role_id"], **kw)
+
+        op.drop_index("ix_users_username", table_name="users", **kw)
+        op.drop_index("ix_users_email", table_name="users", **kw)
+        op.drop_index("ix_users_id", table_name="users", **kw)
+        op.drop_index("ix_roles_id", table_name="roles", **kw)
+
+
+def downgrade() -> None:
+    concurrently = _is_postgresql()
+    kw = {"postgresql_concurrently": concurrently}
+
+    with _index_block(concurrently):
+        op.create_index("ix_roles_id", "roles", ["id"], **kw)
+        op.create_index("ix_users_id", "users", ["id"], **kw)
+        op.create_index("ix_users_email", "users", ["email"], unique=True, **kw)
+        op.create_index("ix_users_username", "users", ["username"], unique=True, **kw)
+
+        op.drop_index("ix_users_role_id", table_name="users", **kw)
+        op.drop_index("ix_users_email_lower", table_name="users", **kw)
+        op.drop_index("ix_users_username_lower", table_name="users", **kw)
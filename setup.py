@@ -6,8 +6,9 @@ setup(
     packages=find_packages(),
     install_requires=[
         "fastapi>=0.68.0,<0.69.0",
-        "uvicorn>=0.15.0,<0.16.0",
-        "sqlalchemy>=1.4.23,<1.5.0",
+        "uvicorn>=0.30.0,<0.34.0",
+        "sqlalchemy>=1.4.33,<1.5.0",
+        "alembic>=1.7.0,<2.0.0",
         "pydantic>=1.8.0,<2.0.0",
         "python-jose[cryptography]>=3.3.0,<3.4.0",
         "passlib[bcrypt]>=1.7.4,<1.8.0",
@@ -19,7 +20,15 @@ setup(
         "requests>=2.26.0,<2.27.0",
     ],
     extras_require={
+        "server": [
+            "uvloop>=0.16.0; sys_platform != 'win32'",
+            "httptools>=0.5.0",
+        ],
+        "redis": [
+            "redis>=4.2.0,<6.0.0",
+        ],
         "dev": [
+            "fakeredis>=2.10.0,<3.0.0",
             "pytest>=6.2.5,<6.3.0",
             "pytest-cov>=2.12.1,<2.13.0",
             "flake8>=3.9.2,<3.10.0",
@@ -27,5 +36,10 @@ setup(
             "isort>=5.9.3,<5.10.0",
         ],
     },
+    entry_points={
+        "console_scripts": [
+            "serve=app.server:main",
+        ],
+    },
     python_requires=">=3.8",
 ) 
\ No newline at end of file
@@ -0,0 +1,149 @@
+import multiprocessing
+import time
+
+import fakeredis
+import pytest
+
+from app.invalidation import (
+    ROLE, USER, InvalidatingCache, LocalInvalidationBus, RedisInvalidationBus,
+)
+
+MAX_DELAY = 0.1
+
+
+def wait_until(predicate, timeout=MAX_DELAY * 20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def redis_workers():
+    """Two workers' buses sharing one fake Redis server"""
+    server = fakeredis.FakeServer()
+    buses = [
+        RedisInvalidationBus(
+            max_delay=MAX_DELAY, client=fakeredis.FakeRedis(server=server)
+        ).start()
+        for _ in range(2)
+    ]
+    yield buses
+    for bus in buses:
+        bus.close()
+
+
+def _publish_from_child(path, key):
+    LocalInvalidationBus(path, max_delay=MAX_DELAY).publish(USER, key)
+
+
+def test_redis_event_reaches_other_worker(redis_workers):
+    """Test that an invalidation on one worker evicts the entry on another"""
+    publisher, subscriber = redis_workers
+    cache = InvalidatingCache(subscriber, USER)
+    cache.get_or_load("alice", lambda: "cached")
+    cache.get_or_load("bob", lambda: "cached")
+
+    event = publisher.publish(USER, "alice")
+
+    assert event.version == 1
+    assert wait_until(lambda: cache.get("alice") is None)
+    assert cache.get("bob") == "cached"
+
+
+def test_redis_ignores_other_kinds(redis_workers):
+    """Test that a role invalidation leaves the user cache alone"""
+    publisher, subscriber = redis_workers
+    cache = InvalidatingCache(subscriber, USER)
+    cache.get_or_load("Admin", lambda: "cached")
+    cache.get_or_load("marker", lambda: "cached")
+
+    publisher.publish(ROLE, "Admin")
+    publisher.publish(USER, "marker")
+
+    assert wait_until(lambda: cache.get("marker") is None)
+    assert cache.get("Admin") == "cached"
+
+
+def test_redis_missed_event_resets_cache(redis_workers):
+    """Test that a version lost in transit clears the cache within the bounded delay"""
+    publisher, subscriber = redis_workers
+    cache = InvalidatingCache(subscriber, USER)
+    cache.get_or_load("alice", lambda: "cached")
+
+    # Bump the counter without publishing, as if the message was dropped.
+    publisher._client.incr(publisher._counter_key)
+
+    assert wait_until(lambda: len(cache) == 0, timeout=MAX_DELAY * 5)
+
+
+def test_redis_keys_are_normalized(redis_workers):
+    """Test that non-str and differently cased keys match published events"""
+    publisher, subscriber = redis_workers
+    by_id = InvalidatingCache(subscriber, ROLE)
+    by_name = InvalidatingCache(subscriber, USER)
+    by_id.get_or_load(5, lambda: "cached")
+    by_name.get_or_load("Alice", lambda: "cached")
+
+    publisher.publish(ROLE, 5)
+    publisher.publish(USER, "alice")
+
+    assert wait_until(lambda: by_id.get("5") is None and by_name.get("ALICE") is None)
+
+
+def test_local_event_from_other_process(tmp_path):
+    """Test that an event published by another process reaches this one"""
+    path = str(tmp_path / "invalidation.log")
+    bus = LocalInvalidationBus(path, max_delay=MAX_DELAY).start()
+    cache = InvalidatingCache(bus, USER)
+    cache.get_or_load("alice", lambda: "cached")
+    try:
+        process = multiprocessing.get_context("spawn").Process(
+            target=_publish_from_child, args=(path, "alice")
+        )
+        process.start()
+        process.join(timeout=30)
+
+        assert process.exitcode == 0
+        assert wait_until(lambda: cache.get("alice") is None)
+    finally:
+        bus.close()
+
+
+def test_local_log_rotation_resets_cache(tmp_path):
+    """Test that subscribers reset when the log is rotated"""
+    path = str(tmp_path / "invalidation.log")
+    bus = LocalInvalidationBus(path, max_delay=MAX_DELAY, max_bytes=0).start()
+    cache = InvalidatingCache(bus, USER)
+    cache.get_or_load("bob", lambda: "cached")
+    try:
+        bus.publish(USER, "alice")
+        assert wait_until(lambda: cache.get("bob") is None)
+    finally:
+        bus.close()
+
+
+def test_cache_drops_value_loaded_during_invalidation(tmp_path):
+    """Test that a load racing an invalidation is not cached"""
+    bus = LocalInvalidationBus(str(tmp_path / "invalidation.log"))
+    cache = InvalidatingCache(bus, USER)
+
+    def loader():
+        cache.invalidate("alice")
+        return "stale"
+
+    assert cache.get_or_load("alice", loader) == "stale"
+    assert cache.get("alice") is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test that the cache stays within maxsize"""
+    bus = LocalInvalidationBus(str(tmp_path / "invalidation.log"))
+    cache = InvalidatingCache(bus, USER, maxsize=2)
+    for key in ("a", "b", "c"):
+        cache.get_or_load(key, lambda: key)
+
+    assert cache.get("a") is None
+    assert cache.get("c") == "c"
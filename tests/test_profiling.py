@@ -0,0 +1,147 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import profiling
+from app.config import SUPERVISOR_PID_ENV, settings
+from app.main import app
+from app.profiling import ProfilingMiddleware, SamplingProfiler, get_stored_profile
+from app.rbac.dependencies import get_current_user
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(tmp_path, monkeypatch):
+    """Keep stored profiles in a per-test directory"""
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler_collapsed_stacks():
+    """Test that a busy thread shows up in the collapsed profile"""
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001).start()
+    time.sleep(0.2)
+    profiler.stop()
+    stop.set()
+    worker.join()
+
+    lines = profiler.collapsed().splitlines()
+    busy = [line for line in lines if line.startswith("busy-worker;")]
+    assert busy
+    stack, count = busy[0].rsplit(" ", 1)
+    assert f"{__name__}:busy_loop" in stack.split(";")
+    assert int(count) > 0
+    assert not any("sampling-profiler" in line for line in lines)
+
+
+def test_profile_requires_authentication():
+    """Test that the profiling endpoint rejects anonymous requests"""
+    response = client.get("/debug/profile?seconds=0.1")
+    assert response.status_code == 401
+
+
+def test_profile_requires_admin():
+    """Test that non-admin users cannot profile"""
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(
+        username="testuser", role=SimpleNamespace(name="User")
+    )
+    try:
+        response = client.get("/debug/profile?seconds=0.1")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 403
+
+
+def test_profile_as_admin():
+    """Test that an admin gets a collapsed-stack profile"""
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(
+        username="admin", role=SimpleNamespace(name="Admin")
+    )
+    try:
+        response = client.get("/debug/profile?seconds=0.2&interval_ms=1")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert all(line.startswith(f"worker-{os.getpid()};") for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_profile_without_fcntl_or_signal(monkeypatch):
+    """Test that profiling falls back to this process where fcntl/SIGUSR2 lack"""
+    monkeypatch.setattr(profiling, "fcntl", None)
+    monkeypatch.setattr(profiling, "PROFILE_SIGNAL", None)
+    monkeypatch.setenv(SUPERVISOR_PID_ENV, str(os.getppid()))
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(
+        username="admin", role=SimpleNamespace(name="Admin")
+    )
+    try:
+        response = client.get("/debug/profile?seconds=0.1&interval_ms=1")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert response.text.startswith(f"worker-{os.getpid()};")
+
+
+def test_app_does_not_import_server():
+    """Test that importing the app does not pull in the POSIX-only supervisor"""
+    code = "import sys, app.main; sys.exit('app.server' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
+
+
+def test_session_collects_worker_profiles():
+    """Test that a worker's share of a cluster-wide profile is collected"""
+    session_id = "a" * 32
+    profiling._start_session(session_id, 0.1, 0.001)
+    profiling._sample_for_session()
+
+    lines = profiling._collect_session(session_id).splitlines()
+    assert lines
+    assert all(line.startswith(f"worker-{os.getpid()};") for line in lines)
+    assert profiling._collect_session(session_id) == ""
+
+
+def test_stored_profile_rejects_invalid_id(profile_dir):
+    """Test that profile ids cannot escape the profile directory"""
+    (profile_dir / "secret.txt").write_text("secret")
+    assert get_stored_profile("../secret") is None
+    assert get_stored_profile("f" * 32) is None
+
+
+def test_request_profiling_header():
+    """Test that only requests with the right token are profiled"""
+    profiled_app = FastAPI()
+
+    @profiled_app.get("/slow")
+    def slow():
+        time.sleep(0.05)
+        return {}
+
+    profiled_app.add_middleware(ProfilingMiddleware, token="secret")
+    profiled_client = TestClient(profiled_app)
+
+    assert "x-profile-id" not in profiled_client.get("/slow").headers
+    response = profiled_client.get("/slow", headers={"X-Profile": "wrong"})
+    assert "x-profile-id" not in response.headers
+
+    response = profiled_client.get("/slow", headers={"X-Profile": "secret"})
+    profile = get_stored_profile(response.headers["x-profile-id"])
+    assert profile is not None
+    assert f"{__name__}:test_request_profiling_header.<locals>.slow" in profile
@@ -0,0 +1,90 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from app.config import settings
+from app.server import MAX_RESTARTS, Supervisor, available_cpus, build_config
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_available_cpus():
+    """Test that at least one CPU is reported"""
+    assert available_cpus() >= 1
+
+
+def test_build_config_defaults():
+    """Test that the server config is taken from Settings"""
+    config = build_config()
+    assert config.port == settings.PORT
+    assert config.backlog == settings.BACKLOG
+    assert config.timeout_keep_alive == settings.KEEPALIVE_TIMEOUT
+    assert config.timeout_graceful_shutdown == settings.GRACEFUL_TIMEOUT
+    assert config.workers == (settings.WEB_CONCURRENCY or available_cpus())
+    assert config.loop in ("uvloop", "asyncio")
+    assert config.http in ("httptools", "h11")
+
+
+def test_build_config_overrides():
+    """Test that explicit arguments win over Settings"""
+    config = build_config(host="127.0.0.1", port=9000, workers=3)
+    assert (config.host, config.port, config.workers) == ("127.0.0.1", 9000, 3)
+
+
+def test_serve_multiple_workers():
+    """Test serving with several workers and stopping gracefully on SIGTERM"""
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "app.server", "--host", "127.0.0.1",
+            "--port", str(port), "--workers", "2",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/") as response:
+                    assert response.status == 200
+                break
+            except OSError:
+                assert time.monotonic() < deadline
+                time.sleep(0.2)
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=settings.GRACEFUL_TIMEOUT + 10) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+
+
+def test_serve_exits_when_workers_fail_to_boot():
+    """Test that a worker failing at startup stops the server instead of respawning"""
+    process = subprocess.run(
+        [
+            sys.executable, "-m", "app.server", "--host", "127.0.0.1",
+            "--port", str(free_port()), "--workers", "2", "--no-preload",
+        ],
+        env=dict(os.environ, DATABASE_URL="invalid://"),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        timeout=settings.GRACEFUL_TIMEOUT + 30,
+    )
+    assert process.returncode != 0
+
+
+def test_supervisor_detects_crash_loop():
+    """Test that too many restarts in the window count as a crash loop"""
+    supervisor = Supervisor(build_config(workers=2))
+    assert not any(supervisor._crash_looping() for _ in range(MAX_RESTARTS))
+    assert supervisor._crash_looping()